@@ -1,12 +1,17 @@
 from swayipc import *
+from swayipc.criteria import where
 
 def show_titlebar_smart(event):
     """ Hide the application title bar when there's only one visible app in the workspace."""
-    for n in get_nodes():
-        if n.type != NodeType.WORKSPACE or n.name == "__i3_scratch":
+    commands = []
+    for name, child_count in iter_workspaces_shallow():
+        if name == "__i3_scratch":
             continue
-        border = "none" if len(n.nodes) == 1 else "normal"        
-        run_command(f'{where(workspace=n.name)} border {border}')
+        border = "none" if child_count == 1 else "normal"
+        commands.append(f'{where(workspace=name)} border {border}')
+    # Sway runs `;`-separated commands from a single message.
+    if commands:
+        run_command('; '.join(commands))
 
 if __name__ == "__main__":
     handler = event.Dispatcher()
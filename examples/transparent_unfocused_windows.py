@@ -2,14 +2,13 @@ from swayipc import *
 from swayipc.criteria import where
 from swayipc.event import WindowEvent
 
+# The reset half of the command never changes, so build it once.
+CMD_RESET_OPACITY = where(tiling=True) + " opacity 0.75"
+
 def transparent_unfocused_windows(event:WindowEvent):
     """Set the opacity to a lower setting for windows that aren't currently-focused."""
-    
-    cmd_reset_opacity = where(tiling=True) + " opacity 0.75"
     cmd_set_opaque = where(con_id=event.container.id) + " opacity 1.0"
-    
-    result = run_command("; ".join([cmd_reset_opacity, cmd_set_opaque]))
-    print(result)
+    run_command(f"{CMD_RESET_OPACITY}; {cmd_set_opaque}")
 
 if __name__ == "__main__":
     handler = event.Dispatcher()
@@ -1,2 +1,3 @@
 from .ipc import *
 from .event import *
+from .cache import enable_coalesce, disable_coalesce
@@ -0,0 +1,63 @@
+"""
+Opt-in coalescing of read-only IPC queries.
+
+Event handlers commonly re-query the tree or workspace list, and several
+handlers reacting to the same event end up issuing identical requests. When
+coalescing is enabled, a wrapped query that was answered less than `ttl`
+seconds ago *and* during the same event dispatch returns the earlier result
+instead of making another round-trip. Concurrent callers wait for the
+in-flight request rather than issuing their own.
+
+Results are shared between callers, so they should be treated as read-only.
+"""
+import functools
+import threading
+import time
+from typing import Any, Callable, Final, TypeVar
+
+DEFAULT_COALESCE_TTL:Final = 0.05
+
+_F = TypeVar("_F", bound=Callable[..., Any])
+
+_enabled = False
+_ttl_ns = int(DEFAULT_COALESCE_TTL * 1e9)
+_generation = 0
+_caches:list[dict] = []
+
+def enable_coalesce(ttl:float=DEFAULT_COALESCE_TTL):
+    """Enable coalescing of repeated queries made within `ttl` seconds of each other."""
+    global _enabled, _ttl_ns
+    _ttl_ns = int(ttl * 1e9)
+    _enabled = True
+
+def disable_coalesce():
+    """Disable coalescing and drop any cached results."""
+    global _enabled
+    _enabled = False
+    for cache in _caches:
+        cache.clear()
+
+def invalidate():
+    """Mark every cached result as stale. Called once per dispatched event."""
+    global _generation
+    _generation += 1
+
+def coalesce(func:_F) -> _F:
+    """Decorate a query function so that it honours `enable_coalesce()`."""
+    cache:dict[tuple, tuple[int, int, Any]] = {}
+    lock = threading.Lock()
+    _caches.append(cache)
+
+    @functools.wraps(func)
+    def wrapper(*args):
+        if not _enabled:
+            return func(*args)
+        with lock:
+            entry = cache.get(args)
+            now = time.monotonic_ns()
+            if entry is not None and entry[0] == _generation and now - entry[1] < _ttl_ns:
+                return entry[2]
+            result = func(*args)
+            cache[args] = (_generation, now, result)
+            return result
+    return wrapper  # type: ignore[return-value]
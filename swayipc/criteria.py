@@ -1,10 +1,10 @@
-from typing import Final, Optional
+from typing import Final, Optional, TypedDict, Unpack
 from swayipc import *
 
+_ESCAPE_TABLE:Final = str.maketrans({c: f"\\{c}" for c in ('\\', '[', ']', '"', '\'')})
+
 def safe_value(input:str):
-    for c in ('\\', '[', ']', '"', '\''):
-        input = input.replace(c, f"\\{c}")
-    return input
+    return input.translate(_ESCAPE_TABLE)
 
 FOCUSED:Final = "__focused__"
 
@@ -24,23 +24,26 @@ CRITERIA_FIELDS:Final = dict(
     x11_window_type='window_type',
 )
     
+class Criteria(TypedDict, total=False):
+    app_id:Optional[str]
+    con_id:Optional[str|int]
+    con_mark:Optional[str]
+    pid:Optional[int]
+    shell:Optional[str]
+    title:Optional[str]
+    urgent:Optional[str]
+    workspace:Optional[str|int]
+    x11_class:Optional[str]
+    x11_id:Optional[int]
+    x11_instance:Optional[str]
+    x11_window_role:Optional[str]
+    x11_window_type:Optional[str]
+
 def where(
     *,
     floating=False,
     tiling=False,
-    app_id:Optional[str]=None,
-    con_id:Optional[str|int]=None,
-    con_mark:Optional[str]=None,
-    pid:Optional[int]=None,
-    shell:Optional[str]=None,
-    title:Optional[str]=None,
-    urgent:Optional[str]=None,
-    workspace:Optional[str|int]=None,
-    x11_class:Optional[str]=None,
-    x11_id:Optional[int]=None,
-    x11_instance:Optional[str]=None,
-    x11_window_role:Optional[str]=None,
-    x11_window_type:Optional[str]=None,
+    **criteria:Unpack[Criteria],
 ):
     result = []
     
@@ -49,25 +52,14 @@ def where(
     if tiling:
         result.append('tiling')
     
-    fields:Dict[str, str|int|None] = {
-        'app_id': app_id,
-        'con_id': con_id,
-        'con_mark': con_mark,
-        'pid': pid,
-        'shell': shell,
-        'title': title,
-        'urgent': urgent,
-        'workspace': workspace,
-        'class': x11_class,
-        'id': x11_id,
-        'instance': x11_instance,
-        'window_role': x11_window_role,
-        'window_type': x11_window_type,
-    }
-    
-    for field_name, field_value in fields.items():
-        if field_value is not None:
-            if isinstance(field_value, str):
-                field_value = safe_value(field_value)
-            result.append(f"{field_name}={field_value}")
+    # Only the criteria that were actually given need to be looked at.
+    for key, field_value in criteria.items():
+        if field_value is None:
+            continue
+        field_name = CRITERIA_FIELDS.get(key)
+        if field_name is None:
+            raise TypeError(f"where() got an unexpected keyword argument {key!r}")
+        if isinstance(field_value, str):
+            field_value = safe_value(field_value)
+        result.append(f"{field_name}={field_value}")
     return f"[{' '.join(result)}]"
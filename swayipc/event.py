@@ -1,9 +1,13 @@
 import enum
-import json
-from collections import defaultdict
-from typing import Callable, Literal, Optional, List, Dict, Sequence, Tuple, TypeVar, cast
+import functools
+import queue
+import socket
+import threading
+import warnings
+from typing import TYPE_CHECKING, Callable, ClassVar, Final, Literal, Optional, List, Dict, Self, Sequence, Tuple, TypeVar, cast
+from . import cache
 from .loadable import Loadable
-from .ipc import BarConfig, Input, Workspace, Node, MessageType, get_ipc_socket, serialize_message, deserialize_message, PAYLOAD_MAGIC_STRING, RESPONSE_BUFFER_SIZE
+from .ipc import BarConfig, Input, Workspace, Node, MessageType, get_ipc_socket, serialize_message, deserialize_payload, peek_header, PAYLOAD_HEADER_SIZE, RESPONSE_BUFFER_SIZE
 
 class WindowChangeType(enum.Enum):
     new = "new"
@@ -26,18 +30,31 @@ class WorkspaceChangeType(enum.Enum):
     reload = "reload"
 
 class SwayEvent(Loadable):
+    __slots__ = ('mtype', '_dispatch_change')
     mtype: MessageType
+    # Whether `Dispatcher` also routes this event by its `change` field.
+    _dispatch_on_change: ClassVar[bool] = False
+
+    def __new__(cls, data:dict) -> Self:
+        self = cast(Self, Loadable.__new__(cls, data))
+        self._dispatch_change = getattr(self, 'change', None) if cls._dispatch_on_change else None
+        return self
 
 class WorkspaceEvent(SwayEvent):
+    __slots__ = ('change', 'current', 'old')
+    _dispatch_on_change = True
     change: WorkspaceChangeType
     current: Workspace
     old: Optional[Workspace]
 
 class ModeEvent(SwayEvent):
+    __slots__ = ('change', 'pango_markup')
     change:str
     pango_markup:bool
 
 class WindowEvent(SwayEvent):
+    __slots__ = ('change', 'container')
+    _dispatch_on_change = True
     change:WindowChangeType
     container:Node
 
@@ -50,22 +67,31 @@ class BindingEvent(SwayEvent):
     input_type:str
 
 class ShutdownEvent(SwayEvent):
+    __slots__ = ('change',)
     change:Literal["exit"]
 
 class TickEvent(SwayEvent):
+    __slots__ = ('first', 'payload')
     first:bool
     payload:str
 
 class BarStateEvent(SwayEvent):
+    __slots__ = ('id', 'visible_by_modifier')
     id:str
     visible_by_modifier:bool
 
 class InputEvent(SwayEvent):
+    __slots__ = ('change', 'input')
     change:str
     input:Input
 
 class BarConfigEvent(SwayEvent, BarConfig):...
 
+# How much `subscribe()` reads off the socket before parsing what it has.
+SUBSCRIBE_DRAIN_LIMIT:Final = 1 << 20
+DISPATCH_BACKLOG_WARNING:Final = 1000
+DISPATCH_BATCH_SIZE:Final = 64
+
 Dispatchable = MessageType | Tuple[MessageType, WindowChangeType|WorkspaceChangeType]
 _E = TypeVar("_E", bound=SwayEvent)
 
@@ -81,32 +107,80 @@ EVENT_TYPE_TO_EVENT:Dict[MessageType, type[SwayEvent]] = {
     MessageType.EVT_WORKSPACE: WorkspaceEvent
 }
 
+# Calling `__new__` directly skips `type.__call__` and the no-op `__init__`.
+EVENT_CONSTRUCTORS:Dict[MessageType, Callable[[dict], SwayEvent]] = {
+    mtype: functools.partial(event_type.__new__, event_type)
+    for mtype, event_type in EVENT_TYPE_TO_EVENT.items()
+}
+
+@functools.lru_cache(maxsize=8)
+def _subscribe_message(events:Tuple[MessageType, ...]) -> bytes:
+    """Serialize the subscribe request once per distinct set of events."""
+    return serialize_message(
+        MessageType.SUBSCRIBE,
+        [e.subfield() for e in events if e.subfield() is not None]
+    )
+
 def subscribe(events:Sequence[MessageType]):
     """ Subscribe to the given sequence of events.
     
     This function returns a generator that yields each message recieved from the IPC socket.
     """
     with get_ipc_socket() as s:
-        s.send(serialize_message(
-            MessageType.SUBSCRIBE,
-            json.dumps([e.subfield() for e in events if e.subfield() is not None])
-        ))
-        buffer = b""
-        while True:
-            buffer += s.recv(RESPONSE_BUFFER_SIZE)
-            while PAYLOAD_MAGIC_STRING in buffer:
-                mtype, message, buffer = deserialize_message(buffer)
-                if mtype == MessageType.SUBSCRIBE: continue
-                if not mtype.is_event():
-                    raise TypeError(f"The payload type of a subscribe response is not an event. mtype={mtype}")
-                event = cast(SwayEvent, EVENT_TYPE_TO_EVENT[mtype](**message))
-                event.mtype = mtype
-                yield event
+        yield from _read_subscribed(s, events)
+
+def _read_subscribed(s:socket.socket, events:Sequence[MessageType]):
+    """Subscribe to `events` on the socket `s`, and yield each event until the socket closes."""
+    s.send(_subscribe_message(tuple(events)))
+    buffer = bytearray()
+    chunk = bytearray(RESPONSE_BUFFER_SIZE)
+    chunk_view = memoryview(chunk)
+    get_constructor = EVENT_CONSTRUCTORS.get
+    closed = False
+    while not closed:
+        received = s.recv_into(chunk)
+        if received == 0:
+            return
+        buffer += chunk_view[:received]
+        # Drain anything else already queued on the socket, so that a burst
+        # of events is parsed as a single batch.
+        while len(buffer) < SUBSCRIBE_DRAIN_LIMIT:
+            try:
+                received = s.recv_into(chunk, 0, socket.MSG_DONTWAIT)
+            except BlockingIOError:
+                break
+            if received == 0:
+                closed = True
+                break
+            buffer += chunk_view[:received]
+        # Sway always frames messages back to back, so each message starts
+        # exactly where the previous one ended.
+        consumed = 0
+        buffer_length = len(buffer)
+        while buffer_length - consumed >= PAYLOAD_HEADER_SIZE:
+            mtype, length = peek_header(buffer, consumed)
+            end = consumed + length
+            if end > buffer_length:
+                break
+            start, consumed = consumed + PAYLOAD_HEADER_SIZE, end
+            # Decide whether the message is wanted before decoding its payload.
+            construct = get_constructor(mtype)
+            if construct is None:
+                if mtype is MessageType.SUBSCRIBE or mtype.is_event(): continue
+                raise TypeError(f"The payload type of a subscribe response is not an event. mtype={mtype}")
+            # The view must be released before the buffer can be resized.
+            with memoryview(buffer) as view:
+                message = deserialize_payload(view[start:end])
+            event = construct(message)
+            event.mtype = mtype
+            yield event
+        # Drop every fully-parsed message in one go.
+        del buffer[:consumed]
 
 #
 # Event handler callback types
 #
-EventHandler_T = Callable[[BarStateEvent], bool|None]
+EventHandler_T = Callable[[SwayEvent], bool|None]
 BarStateHandler_T = Callable[[BarStateEvent], bool|None]
 BarConfigHandler_T = Callable[[BarConfigEvent], bool|None]
 BindingHandler_T = Callable[[BindingEvent], bool|None]
@@ -117,32 +191,112 @@ ShutdownHandler_T = Callable[[ShutdownEvent], bool|None]
 WindowHandler_T = Callable[[WindowEvent], bool|None]
 WorkspaceHandler_T = Callable[[WorkspaceEvent], bool|None]
 
+def _read_events(s:socket.socket, events:Sequence[MessageType], pending:'queue.SimpleQueue[SwayEvent|BaseException|None]'):
+    """Forward subscribed events to `pending`, followed by `None` once the socket closes."""
+    try:
+        for event in _read_subscribed(s, events):
+            pending.put(event)
+    except BaseException as e:
+        pending.put(e)
+    pending.put(None)
+
+def _drain(pending:'queue.SimpleQueue[SwayEvent|BaseException|None]', max_items:int=DISPATCH_BATCH_SIZE) -> list[SwayEvent|BaseException|None]:
+    """Block until an item is available, then take up to `max_items` without blocking."""
+    batch = [pending.get()]
+    try:
+        while len(batch) < max_items:
+            batch.append(pending.get_nowait())
+    except queue.Empty:
+        pass
+    return batch
+
+def _call_handlers(funcs:list[Callable], event:SwayEvent):
+    """Call each handler in turn, until one of them returns `False`."""
+    for func in funcs:
+        if func(event) is False:
+            break
+
 class Dispatcher:
     handlers: Dict[Dispatchable, list[Callable]]
+    subscribed: Optional[frozenset[MessageType]]
     
     def __init__(self):
-        self.handlers = defaultdict(list)
+        self.handlers = {}
+        self.subscribed = None
     
-    def dispatch(self, event:SwayEvent, change_type:Optional[WindowChangeType|WorkspaceChangeType]=None):
-        t = event.mtype
-        if change_type is not None:
-            t = (t, change_type)
-        if t in self.handlers:
-            for handler in self.handlers[t]:
-                result = handler(event)
-                if result == False:
-                    break
+    def dispatch(self, event:SwayEvent):
+        """Call the handlers for the event type, then those for its specific change type."""
+        cache.invalidate()
+        handlers = self.handlers
+        mtype = event.mtype
+        funcs = handlers.get(mtype)
+        if funcs:
+            _call_handlers(funcs, event)
+        change = event._dispatch_change
+        if change is not None:
+            funcs = handlers.get((mtype, change))
+            if funcs:
+                _call_handlers(funcs, event)
     
     def register(self, mtype:Dispatchable, func:Callable[[_E], bool|None]) -> Callable[[_E], bool|None]:
-        if func not in self.handlers[mtype]:
-            self.handlers[mtype].append(func)
+        """
+        Call `func` for each event of the given type.
+        
+        Once `start()` is running, handlers can only be added for event types
+        that were already subscribed to; registering any other type raises
+        `RuntimeError`, since Sway would never send those events.
+        """
+        subscribed = self.subscribed
+        if subscribed is not None and (mtype[0] if isinstance(mtype, tuple) else mtype) not in subscribed:
+            raise RuntimeError(f"Cannot register a handler for {mtype} after the dispatcher has started.")
+        handlers = self.handlers.setdefault(mtype, [])
+        if func not in handlers:
+            handlers.append(func)
         return func
     
     def start(self):
-        for event in subscribe(MessageType.all_events()):
-            self.dispatch(event)
-            if isinstance(event, WindowEvent) or isinstance(event, WorkspaceEvent):
-                self.dispatch(event, change_type=event.change)
+        """
+        Subscribe to the events that have handlers, and dispatch them as they arrive.
+        
+        The socket is read on a separate thread, so a slow handler doesn't stop
+        events from being drained from the socket.
+        
+        Only the event types that have a handler when `start()` is called are
+        subscribed to, so all handlers should be registered beforehand.
+        """
+        # Only subscribe to the events that have a handler registered.
+        events = {key[0] if isinstance(key, tuple) else key for key in self.handlers}
+        pending:queue.SimpleQueue[SwayEvent|BaseException|None] = queue.SimpleQueue()
+        s = get_ipc_socket()
+        reader = threading.Thread(
+            target=_read_events,
+            args=(s, sorted(events, key=lambda e: e.value), pending),
+            daemon=True
+        )
+        self.subscribed = frozenset(events)
+        reader.start()
+        dispatch = self.dispatch
+        try:
+            while True:
+                batch = _drain(pending)
+                if pending.qsize() > DISPATCH_BACKLOG_WARNING:
+                    warnings.warn(f"Event handlers are falling behind; {pending.qsize()} events are waiting to be dispatched.", RuntimeWarning)
+                for item in batch:
+                    if item is None:
+                        return
+                    if isinstance(item, BaseException):
+                        raise item
+                    dispatch(item)
+        finally:
+            # Stop the reader too, however this loop was left; otherwise it
+            # would keep queueing events that nothing reads.
+            try:
+                s.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            reader.join()
+            s.close()
+            self.subscribed = None
     
     def on_bar_state_changed(self, func:BarStateHandler_T) -> BarStateHandler_T:
         return self.register(MessageType.EVT_BAR_STATE, func)
@@ -154,7 +308,7 @@ class Dispatcher:
         return self.register(MessageType.EVT_BINDING, func)
     
     def on_input_changed(self, func:InputHandler_T) -> InputHandler_T:
-        return self.register(MessageType.EVT_BAR_STATE, func)
+        return self.register(MessageType.EVT_INPUT, func)
     
     def on_mode_changed(self, func:ModeHandler_T) -> ModeHandler_T:
         return self.register(MessageType.EVT_MODE, func)
@@ -172,55 +326,39 @@ class Dispatcher:
         return self.register(MessageType.EVT_WORKSPACE, func)
     
     #
-    # Window-specific events
+    # Window- and workspace-specific events
     #
-    def on_window_new(self, func:WindowHandler_T) -> WindowHandler_T:
-        return self.register((MessageType.EVT_WINDOW, WindowChangeType.new), func)
-    
-    def on_window_close(self, func:WindowHandler_T) -> WindowHandler_T:
-        return self.register((MessageType.EVT_WINDOW, WindowChangeType.close), func)
-    
-    def on_window_focus(self, func:WindowHandler_T) -> WindowHandler_T:
-        return self.register((MessageType.EVT_WINDOW, WindowChangeType.focus), func)
-    
-    def on_window_title(self, func:WindowHandler_T) -> WindowHandler_T:
-        return self.register((MessageType.EVT_WINDOW, WindowChangeType.title), func)
-    
-    def on_window_fullscreen(self, func:WindowHandler_T) -> WindowHandler_T:
-        return self.register((MessageType.EVT_WINDOW, WindowChangeType.fullscreen_mode), func)
-    
-    def on_window_move(self, func:WindowHandler_T) -> WindowHandler_T:
-        return self.register((MessageType.EVT_WINDOW, WindowChangeType.move), func)
-    
-    def on_window_floating(self, func:WindowHandler_T) -> WindowHandler_T:
-        return self.register((MessageType.EVT_WINDOW, WindowChangeType.floating), func)
-    
-    def on_window_urgent(self, func:WindowHandler_T) -> WindowHandler_T:
-        return self.register((MessageType.EVT_WINDOW, WindowChangeType.urgent), func)
-    
-    def on_window_mark(self, func:WindowHandler_T) -> WindowHandler_T:
-        return self.register((MessageType.EVT_WINDOW, WindowChangeType.mark), func)
-    
-    #
-    # Workspace-specific events
+    # `on_window_<change>` and `on_workspace_<change>` are resolved against the
+    # change type enums on first access, so new change types work automatically.
     #
-    def on_workspace_init(self, func:WorkspaceHandler_T) -> WorkspaceHandler_T:
-        return self.register((MessageType.EVT_WORKSPACE, WorkspaceChangeType.init), func)
-    
-    def on_workspace_empty(self, func:WorkspaceHandler_T) -> WorkspaceHandler_T:
-        return self.register((MessageType.EVT_WORKSPACE, WorkspaceChangeType.empty), func)
+    def __getattr__(self, name:str) -> Callable[[Callable], Callable]:
+        key = _CHANGE_HOOKS.get(name)
+        if key is None:
+            raise AttributeError(f"{self.__class__.__name__!r} object has no attribute {name!r}")
+        return functools.partial(self.register, key)
     
-    def on_workspace_focus(self, func:WorkspaceHandler_T) -> WorkspaceHandler_T:
-        return self.register((MessageType.EVT_WORKSPACE, WorkspaceChangeType.focus), func)
-    
-    def on_workspace_move(self, func:WorkspaceHandler_T) -> WorkspaceHandler_T:
-        return self.register((MessageType.EVT_WORKSPACE, WorkspaceChangeType.move), func)
-    
-    def on_workspace_rename(self, func:WorkspaceHandler_T) -> WorkspaceHandler_T:
-        return self.register((MessageType.EVT_WORKSPACE, WorkspaceChangeType.rename), func)
-    
-    def on_workspace_urgent(self, func:WorkspaceHandler_T) -> WorkspaceHandler_T:
-        return self.register((MessageType.EVT_WORKSPACE, WorkspaceChangeType.urgent), func)
-    
-    def on_workspace_reload(self, func:WorkspaceHandler_T) -> WorkspaceHandler_T:
-        return self.register((MessageType.EVT_WORKSPACE, WorkspaceChangeType.reload), func)
+    if TYPE_CHECKING:
+        def on_window_new(self, func:WindowHandler_T) -> WindowHandler_T: ...
+        def on_window_close(self, func:WindowHandler_T) -> WindowHandler_T: ...
+        def on_window_focus(self, func:WindowHandler_T) -> WindowHandler_T: ...
+        def on_window_title(self, func:WindowHandler_T) -> WindowHandler_T: ...
+        def on_window_fullscreen(self, func:WindowHandler_T) -> WindowHandler_T: ...
+        def on_window_fullscreen_mode(self, func:WindowHandler_T) -> WindowHandler_T: ...
+        def on_window_move(self, func:WindowHandler_T) -> WindowHandler_T: ...
+        def on_window_floating(self, func:WindowHandler_T) -> WindowHandler_T: ...
+        def on_window_urgent(self, func:WindowHandler_T) -> WindowHandler_T: ...
+        def on_window_mark(self, func:WindowHandler_T) -> WindowHandler_T: ...
+        def on_workspace_init(self, func:WorkspaceHandler_T) -> WorkspaceHandler_T: ...
+        def on_workspace_empty(self, func:WorkspaceHandler_T) -> WorkspaceHandler_T: ...
+        def on_workspace_focus(self, func:WorkspaceHandler_T) -> WorkspaceHandler_T: ...
+        def on_workspace_move(self, func:WorkspaceHandler_T) -> WorkspaceHandler_T: ...
+        def on_workspace_rename(self, func:WorkspaceHandler_T) -> WorkspaceHandler_T: ...
+        def on_workspace_urgent(self, func:WorkspaceHandler_T) -> WorkspaceHandler_T: ...
+        def on_workspace_reload(self, func:WorkspaceHandler_T) -> WorkspaceHandler_T: ...
+
+_CHANGE_HOOKS:Dict[str, Dispatchable] = {
+    **{f"on_window_{c.value}": (MessageType.EVT_WINDOW, c) for c in WindowChangeType},
+    **{f"on_workspace_{c.value}": (MessageType.EVT_WORKSPACE, c) for c in WorkspaceChangeType},
+    # Kept for backwards compatibility
+    "on_window_fullscreen": (MessageType.EVT_WINDOW, WindowChangeType.fullscreen_mode),
+}
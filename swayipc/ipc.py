@@ -13,17 +13,40 @@ Payload structure
 
 """
 from abc import ABCMeta
+import functools
 import json
 import socket
-import sys
+import struct
+import threading
 import os
 import enum
-from typing import Any, Final, Optional, Self, Set, cast, overload
+from typing import Any, Final, Iterable, Iterator, Optional, Self, Set, cast, overload
 
+from .cache import coalesce
 from .loadable import Loadable
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    from orjson import dumps as _json_dumps, loads as _json_loads
+except ImportError:
+    def _json_dumps(obj:Any) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+    
+    def _json_loads(payload:bytes|bytearray|memoryview) -> Any:
+        # `json.loads` takes bytes and bytearray as they are, but not memoryviews.
+        if isinstance(payload, memoryview):
+            payload = str(payload, 'utf-8')
+        return json.loads(payload)
+
 SCRATCHPAD_OUTPUT_NAME = "__i3_scratch"
 PAYLOAD_MAGIC_STRING:Final = b"i3-ipc"
+# <magic-string> <payload-length> <payload-type>, in native byte order
+PAYLOAD_HEADER:Final = struct.Struct(f"={len(PAYLOAD_MAGIC_STRING)}sII")
+PAYLOAD_HEADER_SIZE:Final = PAYLOAD_HEADER.size
 SWAY_SOCK_ENV_VAR:Final = 'I3SOCK'
 RESPONSE_BUFFER_SIZE:Final = 1024 * 100
 EVT_OFFSET = 0x80000000
@@ -58,29 +81,45 @@ class MessageType(enum.Enum):
         return self.value >= EVT_OFFSET
     
     @classmethod
-    def all_events(cls) -> list['MessageType']:
-        return [x for x in cls if x.is_event()]
+    def all_events(cls) -> tuple['MessageType', ...]:
+        return _ALL_EVENTS
     
     def subfield(self:'MessageType') -> str|None:
-        return {
-            self.EVT_WORKSPACE: 'workspace',
-            self.EVT_MODE: 'mode',
-            self.EVT_WINDOW: 'window',
-            self.EVT_BARCONFIG: 'barconfig',
-            self.EVT_BINDING: 'binding',
-            self.EVT_SHUTDOWN: 'shutdown',
-            self.EVT_TICK: 'tick',
-            self.EVT_BAR_STATE: 'bar_state',
-            self.EVT_INPUT: 'input'
-        }.get(self, None)
-
+        return _EVENT_SUBFIELDS.get(self)
+
+_ALL_EVENTS:Final[tuple[MessageType, ...]] = tuple(m for m in MessageType if m.is_event())
+
+_EVENT_SUBFIELDS:Final[dict[MessageType, str]] = {
+    MessageType.EVT_WORKSPACE: 'workspace',
+    MessageType.EVT_MODE: 'mode',
+    MessageType.EVT_WINDOW: 'window',
+    MessageType.EVT_BARCONFIG: 'barconfig',
+    MessageType.EVT_BINDING: 'binding',
+    MessageType.EVT_SHUTDOWN: 'shutdown',
+    MessageType.EVT_TICK: 'tick',
+    MessageType.EVT_BAR_STATE: 'bar_state',
+    MessageType.EVT_INPUT: 'input'
+}
+
+# Looking members up by value through `MessageType(...)` goes through the
+# slower `Enum.__call__` machinery.
+_MESSAGE_TYPE_BY_ID:Final[dict[int, MessageType]] = {m.value: m for m in MessageType}
+
+_EMPTY_MESSAGES:Final[dict[MessageType, bytes]] = {
+    m: PAYLOAD_HEADER.pack(PAYLOAD_MAGIC_STRING, 0, m.value) for m in MessageType
+}
 
 ## ---------------------
 ## Core IPC functions
 ## ---------------------
 
+@functools.cache
 def get_socket_location() -> str:
-    """Obtain the Sway socket location via the I3SOCK environment variable."""
+    """
+    Obtain the Sway socket location via the I3SOCK environment variable.
+    
+    The location is looked up once, and then reused for the life of the process.
+    """
     if SWAY_SOCK_ENV_VAR in os.environ:
         return os.environ[SWAY_SOCK_ENV_VAR]
     raise ValueError('No default socket location available. Is Sway installed and running?')
@@ -91,55 +130,191 @@ def get_ipc_socket(socket_location:Optional[str]=None) -> socket.socket:
         socket_location = get_socket_location()
     s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
     s.connect(socket_location)
+    # The kernel's default buffer sizes are left alone: on a Unix stream socket
+    # only Sway's send buffer limits how much of a reply is queued. There's no
+    # Nagle's algorithm on Unix sockets either, so no TCP_NODELAY is needed.
     return s
 
-def serialize_message(payload_type:MessageType, payload:str|bytes) -> bytes:
-    """Take a payload type and payload body, and serialize it into a series of bytes in the expected format."""
-    if isinstance(payload, str):
+def serialize_message(payload_type:MessageType, payload:str|bytes|list|dict) -> bytes:
+    """
+    Take a payload type and payload body, and serialize it into a series of bytes in the expected format.
+    
+    A `list` or `dict` payload is encoded as JSON.
+    """
+    if isinstance(payload, (list, dict)):
+        payload = _json_dumps(payload)
+    elif not payload:
+        # Most queries have no payload, so their messages are prebuilt.
+        return _EMPTY_MESSAGES[payload_type]
+    elif isinstance(payload, str):
         payload = payload.encode('utf-8')
-    result:list[bytes] = []
-    result.append(PAYLOAD_MAGIC_STRING)
-    result.append(len(payload).to_bytes(4, byteorder=sys.byteorder))
-    result.append(payload_type.value.to_bytes(4, byteorder=sys.byteorder))
-    result.append(payload)
-    return b"".join(result)
-
-def deserialize_message(payload:bytes) -> tuple[MessageType, Any, bytes]:
-    """Take a message recieved from the IPC socket, and parse it into a `Payload` object."""
-    if not payload.startswith(PAYLOAD_MAGIC_STRING):
+    return PAYLOAD_HEADER.pack(PAYLOAD_MAGIC_STRING, len(payload), payload_type.value) + payload
+
+def peek_header(buffer:bytes|bytearray|memoryview, offset:int=0) -> tuple[MessageType, int]:
+    """
+    Read the header of the message starting at `offset` without decoding its payload.
+    
+    Returns the message type and the total length of the message, including the header.
+    """
+    magic, payload_length, payload_type_id = PAYLOAD_HEADER.unpack_from(buffer, offset)
+    if magic != PAYLOAD_MAGIC_STRING:
         raise Exception("Payload contents does not begin with magic string.")
-    payload = payload[len(PAYLOAD_MAGIC_STRING):]
-    payload_length = int.from_bytes(payload[:4], byteorder=sys.byteorder)
-    payload_type_id = int.from_bytes(payload[4:8], byteorder=sys.byteorder)
-    payload_type = MessageType(payload_type_id)
-    current_payload = payload[8:8+payload_length]
-    return payload_type, json.loads(current_payload.decode('utf-8')), payload[8+payload_length:]
+    payload_type = _MESSAGE_TYPE_BY_ID.get(payload_type_id)
+    if payload_type is None:
+        raise ValueError(f"{payload_type_id} is not a valid MessageType")
+    return payload_type, PAYLOAD_HEADER_SIZE + payload_length
 
-def send_ipc_message(ptype: MessageType, payload:Any="") -> Any:
-    """Send a message to the Sway IPC consisting of the given payload type and message."""
-    with get_ipc_socket() as s:
-        s.send(serialize_message(ptype, payload))
-        buffer = s.recv(RESPONSE_BUFFER_SIZE)
-        mtype, message, remaining = deserialize_message(buffer)
+def deserialize_payload(payload:bytes|bytearray|memoryview) -> Any:
+    """
+    Decode the JSON body of a message, excluding its header.
+    
+    Uses `orjson` when it's installed, which parses the bytes directly.
+    """
+    return _json_loads(payload)
+
+def deserialize_message(payload:bytes|bytearray|memoryview) -> tuple[MessageType, Any, bytes|bytearray|memoryview]:
+    """
+    Take a message recieved from the IPC socket, and parse it into a `Payload` object.
+    
+    A `memoryview` may be given to avoid copying the payload out of a larger receive buffer.
+    """
+    payload_type, message_length = peek_header(payload)
+    message = deserialize_payload(payload[PAYLOAD_HEADER_SIZE:message_length])
+    return payload_type, message, payload[message_length:]
+
+def recv_exact(s:socket.socket, size:int) -> bytearray:
+    """Receive exactly `size` bytes from the socket into a preallocated buffer."""
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        n = s.recv_into(view[received:])
+        if n == 0:
+            raise EOFError(f"IPC socket closed after {received} of {size} expected bytes.")
+        received += n
+    return buffer
+
+class SwayIPC:
+    """
+    A persistent connection to the Sway IPC socket.
+    
+    Reusing one connection for many requests avoids the connect and close
+    that every `send_ipc_message()` would otherwise incur.
+    """
+    
+    def __init__(self, socket_location:Optional[str]=None):
+        self.socket = get_ipc_socket(socket_location)
+    
+    def request(self, ptype:MessageType, payload:Any="") -> Any:
+        """Send a message and wait for its reply."""
+        self.send(ptype, payload)
+        return self.receive(ptype)
+    
+    def send(self, ptype:MessageType, payload:Any=""):
+        """Send a message without waiting for its reply."""
+        self.socket.sendall(serialize_message(ptype, payload))
+    
+    def receive(self, ptype:MessageType) -> Any:
+        """Wait for the reply to a message of type `ptype`."""
+        s = self.socket
+        # Read the header first, so that the payload can be read in full no
+        # matter how large it is.
+        mtype, length = peek_header(recv_exact(s, PAYLOAD_HEADER_SIZE))
+        message = deserialize_payload(recv_exact(s, length - PAYLOAD_HEADER_SIZE))
         if mtype != ptype:
             raise Exception(f"IPC response type {mtype} does not match sent type {ptype}")
-        if len(remaining) > 0:
-            raise Exception(f"There should not be any buffer remainder from standard IPC responses. r={repr(remaining)}")
         return message
+    
+    def close(self):
+        self.socket.close()
+    
+    def __enter__(self) -> Self:
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+_thread_state = threading.local()
+
+def _default_client() -> SwayIPC:
+    """Get this thread's shared connection, connecting if needed."""
+    client = getattr(_thread_state, 'client', None)
+    if client is None:
+        client = _thread_state.client = SwayIPC()
+    return client
+
+def _drop_default_client():
+    client = getattr(_thread_state, 'client', None)
+    _thread_state.client = None
+    if client is not None:
+        client.close()
+
+def send_ipc_message(ptype: MessageType, payload:Any="") -> Any:
+    """
+    Send a message to the Sway IPC consisting of the given payload type and message.
+    
+    Each thread reuses a single connection for its messages. If that connection
+    turns out to be closed (e.g. Sway reloaded) while sending, it reconnects and
+    sends once more. Once the message has been sent it is never sent again, so a
+    connection lost while waiting for the reply raises rather than running a
+    command twice.
+    """
+    reused = getattr(_thread_state, 'client', None) is not None
+    client = _default_client()
+    try:
+        client.send(ptype, payload)
+    except ConnectionError:
+        _drop_default_client()
+        if not reused:
+            raise
+        client = _default_client()
+        try:
+            client.send(ptype, payload)
+        except BaseException:
+            _drop_default_client()
+            raise
+    except BaseException:
+        _drop_default_client()
+        raise
+    try:
+        return client.receive(ptype)
+    except BaseException:
+        # The connection can't be trusted to be in sync after a failed request.
+        _drop_default_client()
+        raise
 
 ## ---------------------
 ## Core Sway objects
 ## ---------------------
 
 class SwayObject(Loadable):
-    ...
+    __slots__ = ()
+    
+    def dump_msgpack(self) -> bytes:
+        """
+        Serialize into MessagePack, e.g. for caching tree snapshots.
+        
+        Requires the optional `msgpack` package.
+        """
+        if msgpack is None:
+            raise ImportError("dump_msgpack() requires the `msgpack` package.")
+        return msgpack.packb(self.to_dict(), use_bin_type=True)
+    
+    @classmethod
+    def load_msgpack(cls, data:bytes) -> Self:
+        """Load an object previously serialized with `dump_msgpack()`."""
+        if msgpack is None:
+            raise ImportError("load_msgpack() requires the `msgpack` package.")
+        return cls(msgpack.unpackb(data, raw=False))
 
 class CommandResult(SwayObject):
+    __slots__ = ('success', 'parse_error', 'error')
     success:bool
     parse_error:Optional[bool]
     error:Optional[str]
 
 class Gaps(SwayObject):
+    __slots__ = ('top', 'left', 'bottom', 'right')
     top:int
     left:int
     bottom:int
@@ -215,6 +390,7 @@ class X11Window(SwayObject):
     transient_for:Any
 
 class Rect(SwayObject):
+    __slots__ = ('x', 'y', 'width', 'height')
     x:int
     y:int
     width:int
@@ -300,16 +476,10 @@ class Node(SwayObject, metaclass=ABCMeta):
     def __new__(cls, data:dict) -> Self:
         if cls is Node:
             node_type = data.get('type')
-            if node_type == NodeType.CON.value or node_type == NodeType.FLOATING_CON.value:
-                cls = ContainerNode
-            elif node_type == NodeType.OUTPUT.value:
-                cls = Output
-            elif node_type == NodeType.WORKSPACE.value:
-                cls = Workspace
-            elif node_type == NodeType.ROOT.value:
-                cls = RootNode
-            else:
+            node_cls = _NODE_TYPE_TO_CLASS.get(node_type)
+            if node_cls is None:
                 raise Exception(f"Unknown NodeType: {node_type}")
+            cls = node_cls
         return cast(Self, Loadable.__new__(cls, data))
 
 class RootNode(Node):
@@ -334,11 +504,7 @@ class Output(Node):
     floating_nodes:list['Workspace']
 
 class Workspace(Node):
-    name:str
-    rect:Rect
     visible:bool
-    focused:bool
-    urgent:bool
     num:int
     output:str
     representation:str
@@ -346,7 +512,6 @@ class Workspace(Node):
     floating_nodes:list['ContainerNode']
 
 class ContainerNode(Node):
-    fullscreen_mode:int
     app_id:Optional[str]
     pid:int
     visible:bool
@@ -356,6 +521,14 @@ class ContainerNode(Node):
     window:Optional[int]
     window_properties: Optional[X11Window]
 
+_NODE_TYPE_TO_CLASS:Final[dict[str, type[Node]]] = {
+    NodeType.ROOT.value: RootNode,
+    NodeType.OUTPUT.value: Output,
+    NodeType.WORKSPACE.value: Workspace,
+    NodeType.CON.value: ContainerNode,
+    NodeType.FLOATING_CON.value: ContainerNode,
+}
+
 ## ---------------------
 ## Primary IPC messages
 ## ---------------------
@@ -366,22 +539,27 @@ def run_command(command:str) -> list[CommandResult]:
         MessageType.RUN_COMMAND, 
         command
     )
-    return [CommandResult(r) for r in result]
+    return list(map(CommandResult, result))
+
+def run_commands(commands:Iterable[str]) -> list[CommandResult]:
+    """Run several Sway commands in a single IPC message, returning a result for each."""
+    return run_command('; '.join(commands))
 
-def command_succeeds(command:str) -> bool:
-    """Helper function that returns whether the command succeeded."""
-    return False not in [res.success for res in run_command(command)]
+def command_succeeds(*commands:str) -> bool:
+    """Helper function that returns whether every given command succeeded."""
+    return all(res.success for res in run_commands(commands))
 
+@coalesce
 def get_workspaces() -> list[Workspace]:
     """Get a list of all workspaces."""
-    result = send_ipc_message(MessageType.GET_WORKSPACES)
-    return [Workspace(op) for op in result]
+    return list(map(Workspace, send_ipc_message(MessageType.GET_WORKSPACES)))
 
+@coalesce
 def get_outputs() -> list[Output]:
     """Get a list of all outputs, including the invisible scratchpad output."""
-    result = send_ipc_message(MessageType.GET_OUTPUTS)
-    return [Output(op) for op in result]
+    return list(map(Output, send_ipc_message(MessageType.GET_OUTPUTS)))
 
+@coalesce
 def get_tree() -> RootNode:
     """Get the full node tree."""
     return RootNode(send_ipc_message(MessageType.GET_TREE))
@@ -389,16 +567,27 @@ def get_tree() -> RootNode:
 def get_nodes() -> Set[RootNode|Output|Workspace|ContainerNode]:
     """Get the node tree and flatten it into a set."""
     result = set()
-    nodes:list[RootNode|Output|Workspace|ContainerNode] = [get_tree()]
-    if nodes is None:
-        return set()
-    while len(nodes) > 0:
-        n = nodes.pop(0)
+    # The result is unordered, so a stack (popping from the tail) is enough.
+    stack:list[RootNode|Output|Workspace|ContainerNode] = [get_tree()]
+    while stack:
+        n = stack.pop()
         result.add(n)
-        nodes.extend(n.nodes)
-        nodes.extend(n.floating_nodes)
+        stack.extend(n.nodes)
+        stack.extend(n.floating_nodes)
     return result
 
+def iter_workspaces_shallow() -> Iterator[tuple[str, int]]:
+    """
+    Iterate over the name and number of tiled children of each workspace in the tree.
+    
+    Unlike `get_nodes()`, this reads the raw tree reply without building node
+    objects, which is much cheaper when only the workspace overview is needed.
+    """
+    tree = send_ipc_message(MessageType.GET_TREE)
+    for output in tree['nodes']:
+        for workspace in output['nodes']:
+            yield workspace['name'], len(workspace.get('nodes', ()))
+
 def get_marks() -> list[str]:
     """Get a list of marks currently in use."""
     return send_ipc_message(MessageType.GET_MARKS)
@@ -443,17 +632,11 @@ def get_binding_state() -> str:
 
 def get_inputs() -> list[Input]:
     """Get a list of all inputs."""
-    return [
-        Input(op)
-        for op in send_ipc_message(MessageType.GET_INPUTS)
-    ]
+    return list(map(Input, send_ipc_message(MessageType.GET_INPUTS)))
 
 def get_seats() -> list[Seat]:
     """Get a list of all seats."""
-    return [
-        Seat(op) 
-        for op in send_ipc_message(MessageType.GET_SEATS)
-    ]
+    return list(map(Seat, send_ipc_message(MessageType.GET_SEATS)))
 
 def kill(criteria_or_node:Node):
     if isinstance(criteria_or_node, Node):
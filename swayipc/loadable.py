@@ -1,48 +1,171 @@
 from abc import ABCMeta
+import enum
+from functools import lru_cache
 from types import NoneType
-from typing import Union, get_type_hints, Any
+from typing import Any, Callable, ClassVar, Final, Literal, Optional, Union, get_type_hints
 try:
     from typing import get_args, get_origin
 except ImportError:
     get_args = lambda t: getattr(t, '__args__', ())
     get_origin = lambda t: getattr(t, '__origin__', None)
 
-def _value(field_type, value):
-        if value is None or value == "none":
-            return None
-        if issubclass(field_type, Loadable):
-            return field_type(value)
-        if field_type is Any:
-            return value
-        return field_type(value)
+@lru_cache(maxsize=None)
+def _hints_for(cls) -> dict[str, Any]:
+    """Resolve the type hints of a class once, rather than on every instance."""
+    hints = get_type_hints(cls)
+    # Swap forward references such as `list['Workspace']` for the resolved
+    # types, so later introspection of the class has nothing left to evaluate.
+    annotations = cls.__dict__.get('__annotations__', {})
+    for name in annotations:
+        annotations[name] = hints[name]
+    return hints
+
+def _primitive(value):
+    if isinstance(value, Loadable):
+        return value.to_dict()
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, list):
+        return [_primitive(v) for v in value]
+    return value
+
+# Field kinds in `Loadable._field_spec`.
+_SCALAR:Final = 0
+_LIST:Final = 1
+_OPTIONAL:Final = 2
+
+def _field_spec_for(cls) -> dict[str, tuple[int, Any, bool]]:
+    """Work out how each annotated field of `cls` gets converted."""
+    specs = {}
+    for name, field_type in _hints_for(cls).items():
+        field_origin = get_origin(field_type)
+        if field_origin is ClassVar:
+            continue
+        field_args = get_args(field_type)
+        if field_origin is list:
+            kind, field_type = _LIST, field_args[0]
+        elif field_origin is Union and len(field_args) == 2 and NoneType in field_args:
+            kind, field_type = _OPTIONAL, field_args[field_args[0] is NoneType]
+        else:
+            kind = _SCALAR
+        is_loadable = isinstance(field_type, type) and issubclass(field_type, Loadable)
+        specs[name] = (kind, field_type, is_loadable)
+    return specs
+
+_MISSING:Final = object()
+
+# Field types whose decoded JSON values are kept as they are. `float` and `str`
+# are left out on purpose: sway sends whole numbers for fields like `refresh`,
+# and numbers for some `str` fields such as `Input.vendor`.
+_PASSTHROUGH:Final = frozenset((int, bool, dict, list))
+
+# Field types that JSON never delivers as a string.
+_NEVER_STRINGS:Final = frozenset((int, float, bool, dict, list))
+
+def _set_extra(self, data:dict, spec:dict):
+    """Keep any keys that the class does not annotate as plain attributes."""
+    for key, value in data.items():
+        if key in spec:
+            continue
+        try:
+            setattr(self, key, value)
+        except AttributeError:
+            # Classes using `__slots__` only keep their declared fields.
+            pass
+
+def _compile_loader(cls):
+    """
+    Generate a function that fills in a new instance of `cls` from a dict.
+
+    Each annotated field gets its own straight-line lookup and conversion, so
+    loading an object does no per-key dispatch on the field spec.
+    """
+    spec = cls._field_spec = _field_spec_for(cls)
+    namespace:dict[str, Any] = {'_MISSING': _MISSING, '_set_extra': _set_extra, '_spec': spec}
+    lines = [
+        "    get = data.get",
+        "    found = 0",
+    ]
+    for i, (name, (kind, field_type, is_loadable)) in enumerate(spec.items()):
+        namespace[f"_type{i}"] = field_type
+        if field_type is Any or field_type in _PASSTHROUGH or get_origin(field_type) is Literal:
+            # JSON already delivers these as the right type.
+            convert = "{0}"
+        elif isinstance(field_type, enum.EnumMeta) and all(field_type):
+            # Look members up by value directly rather than through
+            # `EnumMeta.__call__`; unknown values still raise from the call.
+            namespace[f"_members{i}"] = field_type._value2member_map_
+            convert = f"_members{i}.get({{0}}) or _type{i}({{0}})"
+        else:
+            convert = f"_type{i}({{0}})"
+        # Sway spells some missing values "none", but only where a string
+        # could appear; numbers, flags and objects just need the `None` check.
+        if is_loadable or field_type in _NEVER_STRINGS:
+            missing = "{0} is None"
+        else:
+            missing = "{0} is None or {0} == 'none'"
+        if convert == "{0}" and missing == "{0} is None":
+            element = "{0}"
+        else:
+            element = f"None if {missing} else {convert}"
+        if kind == _LIST:
+            value = f"[{element.format('e')} for e in v]"
+        else:
+            value = element.format('v')
+        lines += [
+            f"    v = get({name!r}, _MISSING)",
+            f"    if v is not _MISSING:",
+            f"        self.{name} = {value}",
+            f"        found += 1",
+        ]
+    lines += [
+        "    if found != len(data):",
+        "        _set_extra(self, data, _spec)",
+    ]
+    # Everything the body refers to is bound as a keyword default, so that it
+    # is read as a local rather than looked up in the globals on every call.
+    namespace['len'] = len
+    defaults = ", ".join(f"{n}={n}" for n in namespace)
+    lines.insert(0, f"def load(self, data, *, {defaults}):")
+    exec(compile("\n".join(lines), f"<{cls.__qualname__} loader>", "exec"), namespace)
+    return namespace['load']
 
 class Loadable(metaclass=ABCMeta):
+    __slots__ = ()
+    _field_spec:ClassVar[Optional[dict[str, tuple[int, Any, bool]]]] = None
+    _load:ClassVar[Optional[Callable[[Any, dict], None]]] = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Annotations may reference classes that are not defined yet, so the
+        # loader is built on first construction rather than here.
+        cls._field_spec = None
+        cls._load = None
 
     def __new__(cls, data):
-        self = super().__new__(cls)
-        hints = get_type_hints(cls)
-        for key, value in data.items():
-            if key not in hints:
-                setattr(self, key, value)
-                continue
-            field_type = hints[key]
-            field_origin = get_origin(field_type)
-            field_args = set(get_args(field_type))
-            if field_origin == list:
-                field_type = field_args.pop()
-                setattr(self, key, [_value(field_type, v) for v in value])
-            elif field_origin == Union and NoneType in field_args and len(field_args) == 2:
-                field_args.remove(NoneType)
-                field_type = field_args.pop()
-                setattr(self, key, _value(field_type, value))
-            else:
-                setattr(self, key, _value(field_type, value))
+        # Nothing between here and `object` overrides `__new__`, so call it
+        # directly rather than resolving `super()` for every instance.
+        self = object.__new__(cls)
+        load = cls._load
+        if load is None:
+            load = cls._load = _compile_loader(cls)
+        load(self, data)
         return self
 
+    def _fields(self) -> dict[str, Any]:
+        """The public attributes set on this instance, whether in `__dict__` or `__slots__`."""
+        fields = dict(getattr(self, '__dict__', {}))
+        for klass in type(self).__mro__:
+            for name in getattr(klass, '__slots__', ()):
+                if name.startswith('_') or name in fields or not hasattr(self, name):
+                    continue
+                fields[name] = getattr(self, name)
+        return fields
+
+    def to_dict(self) -> dict:
+        """Convert back into plain JSON-compatible data that the class can be loaded from."""
+        return {k: _primitive(v) for k, v in self._fields().items()}
+
     def __str__(self):
-        kv = [
-            f"{n}={repr(getattr(self, n))}\n" 
-            for n in dir(self)
-            if not n.startswith('_') and n not in ['from_dict']
-        ]
-        return f"{self.__class__.__name__}(\n{', '.join(kv)}\n)"
+        fields = ",\n".join(f"{n}={v!r}" for n, v in self._fields().items())
+        return f"{type(self).__name__}(\n{fields}\n)"